@@ -0,0 +1,168 @@
+import sys
+sys.path.append("..")
+import json
+import logging
+import argparse
+from winobjid.batch import BatchScheduler, expand_sources, read_manifest
+from winobjid.writer import VALID_COMPRESSIONS, compression_from_path, is_compression_available
+
+
+VALID_DEBUG_LEVELS = ["ERROR", "WARN", "INFO", "DEBUG"]
+__VERSION__ = "0.0.1"
+
+
+def set_debug_level(debug_level):
+    if debug_level in VALID_DEBUG_LEVELS:
+        logging.basicConfig(
+            level=getattr(logging, debug_level)
+        )
+    else:
+        raise (Exception("{} is not a valid debug level.".format(debug_level)))
+
+
+def get_arguments():
+    usage = u"""Parse many $O Indexes, logical volumes or images in one invocation.
+    version: {}
+    """.format(__VERSION__)
+
+    arguments = argparse.ArgumentParser(
+        description=usage,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    arguments.add_argument(
+        "-s", "--source",
+        dest="sources",
+        action="append",
+        required=False,
+        default=[],
+        help="A source or glob pattern of sources. Can be given more than once."
+    )
+    arguments.add_argument(
+        "-m", "--manifest",
+        dest="manifest",
+        action="store",
+        required=False,
+        default=None,
+        help="A file listing one source (or glob pattern) per line."
+    )
+    arguments.add_argument(
+        "-d", "--output_dir",
+        dest="output_dir",
+        action="store",
+        required=False,
+        default=None,
+        help="Write one output file per source to this directory."
+    )
+    arguments.add_argument(
+        "-f", "--output_file",
+        dest="output_file",
+        action="store",
+        required=False,
+        default=None,
+        help="Write all records to this file. Each record has a source field."
+    )
+    arguments.add_argument(
+        "--compression",
+        dest="compression",
+        action="store",
+        required=False,
+        default=None,
+        choices=VALID_COMPRESSIONS,
+        help="Output compression [default=from the output file extension (.gz, .zst)]"
+    )
+    arguments.add_argument(
+        "--no_recover",
+        dest="no_recover",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Do Not Recover Object Entries."
+    )
+    arguments.add_argument(
+        "--workers",
+        dest="workers",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of worker processes [default=cpu count]. Sources on the same "
+             "device are further limited by --device_workers"
+    )
+    arguments.add_argument(
+        "--device_workers",
+        dest="device_workers",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Max sources read at once from the same device. This also limits --workers "
+             "when the sources share a device [default=no limit]"
+    )
+    arguments.add_argument(
+        "--summary_file",
+        dest="summary_file",
+        action="store",
+        required=False,
+        default=None,
+        help="Write the JSON summary to this file instead of stdout."
+    )
+    arguments.add_argument(
+        "--debug",
+        dest="debug",
+        action="store",
+        default="ERROR",
+        choices=VALID_DEBUG_LEVELS,
+        help="Debug level [default=ERROR]"
+    )
+
+    return arguments
+
+
+def main():
+    arguments = get_arguments()
+    options = arguments.parse_args()
+
+    set_debug_level(
+        options.debug
+    )
+
+    patterns = list(options.sources)
+    if options.manifest:
+        patterns.extend(read_manifest(options.manifest))
+    if not patterns:
+        arguments.error("No sources given, use --source or --manifest")
+
+    if (options.output_dir is None) == (options.output_file is None):
+        arguments.error("Use either --output_dir or --output_file")
+    compression = options.compression
+    if compression is None and options.output_file:
+        compression = compression_from_path(options.output_file)
+    if not is_compression_available(compression):
+        arguments.error("{} compression requires the zstandard package".format(compression))
+    if options.workers is not None and options.workers < 1:
+        arguments.error("--workers must be at least 1")
+    if options.device_workers is not None and options.device_workers < 1:
+        arguments.error("--device_workers must be at least 1")
+
+    scheduler = BatchScheduler(
+        expand_sources(patterns),
+        output_dir=options.output_dir,
+        merged_output=options.output_file,
+        compression=options.compression,
+        workers=options.workers,
+        device_workers=options.device_workers,
+        recover=not options.no_recover
+    )
+    summary = scheduler.run()
+
+    if options.summary_file:
+        with open(options.summary_file, "w") as fh:
+            json.dump(summary, fh, indent=4)
+    else:
+        print(
+            json.dumps(summary, indent=4)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
 import sys
 sys.path.append("..")
-import re
 import json
 import pytsk3
 import logging
 import argparse
 from winobjid.index import ObjectIndexFile
-from winobjid.logical import Volume
+from winobjid.logical import Disk, Volume, is_logical_volume
+from winobjid.stats import ObjectIdStats
+from winobjid.checkpoint import Checkpoint, DEFAULT_CHECKPOINT_BUDGET
+from winobjid.writer import OutputWriter, VALID_COMPRESSIONS, compression_from_path, is_compression_available
 
 
 VALID_DEBUG_LEVELS = ["ERROR", "WARN", "INFO", "DEBUG"]
@@ -54,6 +56,132 @@ def get_arguments():
         default=None,
         help="Output template format."
     )
+    arguments.add_argument(
+        "-f", "--output_file",
+        dest="output_file",
+        action="store",
+        required=False,
+        default=None,
+        help="Write the output to this file instead of stdout."
+    )
+    arguments.add_argument(
+        "--compression",
+        dest="compression",
+        action="store",
+        required=False,
+        default=None,
+        choices=VALID_COMPRESSIONS,
+        help="Output compression [default=from the output file extension (.gz, .zst)]"
+    )
+    arguments.add_argument(
+        "--compression_level",
+        dest="compression_level",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Compression level [default=6 for gzip, 3 for zstd]"
+    )
+    arguments.add_argument(
+        "--compression_threads",
+        dest="compression_threads",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Threads used to compress output blocks [default=cpu count]"
+    )
+    arguments.add_argument(
+        "--shard_pages",
+        dest="shard_pages",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Start a new output file every N index pages."
+    )
+    arguments.add_argument(
+        "--shard_size",
+        dest="shard_size",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Start a new output file once N (uncompressed) bytes have been written."
+    )
+    arguments.add_argument(
+        "--checkpoint_file",
+        dest="checkpoint_file",
+        action="store",
+        required=False,
+        default=None,
+        help="Periodically save progress to this file [default=OUTPUT_FILE.checkpoint "
+             "when --resume is used]"
+    )
+    arguments.add_argument(
+        "--checkpoint_budget",
+        dest="checkpoint_budget",
+        action="store",
+        type=float,
+        required=False,
+        default=DEFAULT_CHECKPOINT_BUDGET,
+        help="Fraction of the run time that may be spent on checkpoints "
+             "[default={}]".format(DEFAULT_CHECKPOINT_BUDGET)
+    )
+    arguments.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Truncate the output to the last checkpoint and continue from there."
+    )
+    arguments.add_argument(
+        "--aggregate",
+        dest="aggregate",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Output a single JSON report of counts per MAC address, birth volume and "
+             "creation day, allocated vs recovered and min/max timestamp instead of records."
+    )
+    arguments.add_argument(
+        "--aggregate_capacity",
+        dest="aggregate_capacity",
+        action="store",
+        type=int,
+        required=False,
+        default=10000,
+        help="Distinct keys counted exactly per aggregate before switching to "
+             "approximate counts [default=10000]"
+    )
+    arguments.add_argument(
+        "--aggregate_top",
+        dest="aggregate_top",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Only list the N largest counts per aggregate [default=all]"
+    )
+    arguments.add_argument(
+        "--disk",
+        dest="disk",
+        action="store_true",
+        required=False,
+        default=False,
+        help="The source is a disk image (or physical drive) with a partition table. "
+             "Every NTFS partition is parsed and records are tagged with the partition."
+    )
+    arguments.add_argument(
+        "--workers",
+        dest="workers",
+        action="store",
+        type=int,
+        required=False,
+        default=None,
+        help="Number of worker processes used with --disk [default=cpu count]"
+    )
     arguments.add_argument(
         "--debug",
         dest="debug",
@@ -66,11 +194,134 @@ def get_arguments():
     return arguments
 
 
-def parse_logical(options):
+def output_record(record, out_template, writer):
+    if out_template:
+        writer.write(
+            out_template.format(
+                **record
+            ) + "\n"
+        )
+    else:
+        writer.write(
+            json.dumps(record) + "\n"
+        )
+
+
+def get_checkpoint_options(options):
+    """The options that change the output. A run can only be resumed with the
+    same values.
+    """
+    compression = options.compression
+    if compression is None:
+        compression = compression_from_path(options.output_file)
+
+    return {
+        "output_file": options.output_file,
+        "compression": compression,
+        "shard_pages": options.shard_pages,
+        "shard_size": options.shard_size,
+        "no_recover": options.no_recover,
+        "output_template": options.output_template
+    }
+
+
+def output_index(obj_id_file, options, writer, checkpoint=None):
+    out_template = None
+    if options.output_template:
+        out_template = options.output_template
+
+    page_offset = 0
+    counters = {
+        "pages": 0,
+        "entries": 0,
+        "recovered": 0
+    }
+    if checkpoint and checkpoint.state:
+        if checkpoint.state["complete"]:
+            logging.info("Checkpoint is complete, nothing to resume.")
+            return
+        page_offset = checkpoint.state["page_offset"]
+        counters = checkpoint.state["counters"]
+        logging.info("Resuming at page offset {}".format(page_offset))
+
+    def get_state(complete=False):
+        return {
+            "source": options.source,
+            "options": get_checkpoint_options(options),
+            "page_offset": page_offset,
+            "complete": complete,
+            "output": writer.sync(),
+            "counters": counters
+        }
+
+    for index_page in obj_id_file.iter_index_pages(offset=page_offset):
+        for entry in index_page.iter_entries():
+            output_record(entry.as_dict(), out_template, writer)
+            counters["entries"] += 1
+
+        if not options.no_recover:
+            for unalloc_entry in index_page.iter_unalloc_entries():
+                output_record(unalloc_entry.as_dict(), out_template, writer)
+                counters["recovered"] += 1
+
+        writer.end_page()
+        counters["pages"] += 1
+        page_offset = index_page.get_offset() + index_page.get_page_size()
+        if checkpoint:
+            checkpoint.maybe_save(get_state)
+
+    if checkpoint:
+        checkpoint.save(get_state(complete=True))
+        logging.info("{} checkpoints saved.".format(checkpoint.saves))
+
+
+def aggregate_index(obj_id_file, options, writer):
+    stats = ObjectIdStats(
+        capacity=options.aggregate_capacity,
+        top=options.aggregate_top
+    )
+    for index_page in obj_id_file.iter_index_pages():
+        for entry in index_page.iter_entries():
+            stats.add_entry(entry)
+
+        if not options.no_recover:
+            for unalloc_entry in index_page.iter_unalloc_entries():
+                stats.add_entry(unalloc_entry)
+
+    writer.write(
+        json.dumps(stats.as_dict()) + "\n"
+    )
+
+
+def process_index(obj_id_file, options, writer, checkpoint=None):
+    if options.aggregate:
+        aggregate_index(obj_id_file, options, writer)
+    else:
+        output_index(obj_id_file, options, writer, checkpoint=checkpoint)
+
+
+def parse_disk(options, writer):
     out_template = None
     if options.output_template:
         out_template = options.output_template
 
+    try:
+        disk = Disk(
+            options.source
+        )
+    except IOError as error:
+        logging.error("Unable to read the partition table of {}: {}".format(
+            options.source, error
+        ))
+        sys.exit(1)
+
+    for record in disk.iter_entries(
+            recover=not options.no_recover,
+            workers=options.workers):
+        output_record(record, out_template, writer)
+
+
+def parse_logical(options, writer, checkpoint=None):
     tsk_img = pytsk3.Img_Info(
         options.source
     )
@@ -82,67 +333,15 @@ def parse_logical(options):
         obj_id_file = ObjectIndexFile(
             file_io
         )
-        for index_page in obj_id_file.iter_index_pages():
-            for entry in index_page.iter_entries():
-                if out_template:
-                    print(
-                        out_template.format(
-                            **entry.as_dict()
-                        )
-                    )
-                else:
-                    print(
-                        json.dumps(entry.as_dict())
-                    )
-
-            if not options.no_recover:
-                for unalloc_entry in index_page.iter_unalloc_entries():
-                    if out_template:
-                        print(
-                            out_template.format(
-                                **unalloc_entry.as_dict()
-                            )
-                        )
-                    else:
-                        print(
-                            json.dumps(unalloc_entry.as_dict())
-                        )
-
-
-def parse_file(options):
-    out_template = None
-    if options.output_template:
-        out_template = options.output_template
+        process_index(obj_id_file, options, writer, checkpoint=checkpoint)
 
+
+def parse_file(options, writer, checkpoint=None):
     with open(options.source, 'rb') as fh:
         obj_id_file = ObjectIndexFile(
             fh
         )
-
-        for index_page in obj_id_file.iter_index_pages():
-            for entry in index_page.iter_entries():
-                if out_template:
-                    print(
-                        out_template.format(
-                            **entry.as_dict()
-                        )
-                    )
-                else:
-                    print(
-                        json.dumps(entry.as_dict())
-                    )
-            if not options.no_recover:
-                for unalloc_entry in index_page.iter_unalloc_entries():
-                    if out_template:
-                        print(
-                            out_template.format(
-                                **unalloc_entry.as_dict()
-                            )
-                        )
-                    else:
-                        print(
-                            json.dumps(unalloc_entry.as_dict())
-                        )
+        process_index(obj_id_file, options, writer, checkpoint=checkpoint)
 
 
 def main():
@@ -153,10 +352,76 @@ def main():
         options.debug
     )
 
-    if re.match('\\\\\\\.\\\[a-zA-Z]:', options.source):
-        parse_logical(options)
-    else:
-        parse_file(options)
+    if options.disk and options.aggregate:
+        arguments.error("--aggregate is not supported with --disk")
+
+    if (options.shard_pages or options.shard_size) and not options.output_file:
+        arguments.error("--shard_pages and --shard_size require --output_file")
+    if options.disk and (options.shard_pages or options.shard_size):
+        arguments.error("--shard_pages and --shard_size are not supported with --disk")
+    if options.aggregate and (options.shard_pages or options.shard_size):
+        arguments.error("--shard_pages and --shard_size are not supported with --aggregate")
+
+    compression = options.compression
+    if compression is None and options.output_file:
+        compression = compression_from_path(options.output_file)
+    if not is_compression_available(compression):
+        arguments.error("{} compression requires the zstandard package".format(compression))
+
+    checkpoint = None
+    resume_state = None
+    if options.checkpoint_file or options.resume:
+        if not options.output_file:
+            arguments.error("--checkpoint_file and --resume require --output_file")
+        if options.disk or options.aggregate:
+            arguments.error("--checkpoint_file and --resume are not supported with --disk or --aggregate")
+
+        checkpoint = Checkpoint(
+            options.checkpoint_file or options.output_file + ".checkpoint",
+            budget=options.checkpoint_budget
+        )
+        if options.resume:
+            checkpoint.load()
+            if checkpoint.state is None:
+                logging.warning("No checkpoint at {}, starting from the beginning.".format(
+                    checkpoint.path
+                ))
+            elif checkpoint.state["source"] != options.source:
+                arguments.error("Checkpoint {} is for source {}".format(
+                    checkpoint.path, checkpoint.state["source"]
+                ))
+            elif checkpoint.state.get("options") != get_checkpoint_options(options):
+                arguments.error("Checkpoint {} was written with different options: {}".format(
+                    checkpoint.path, json.dumps(checkpoint.state.get("options"))
+                ))
+            else:
+                resume_state = checkpoint.state["output"]
+
+    try:
+        writer = OutputWriter(
+            path=options.output_file,
+            compression=options.compression,
+            level=options.compression_level,
+            threads=options.compression_threads,
+            shard_pages=options.shard_pages,
+            shard_size=options.shard_size,
+            resume=resume_state
+        )
+    except OSError as error:
+        if resume_state is None:
+            raise
+        arguments.error("Unable to resume the output of checkpoint {}: {}".format(
+            checkpoint.path, error
+        ))
+    try:
+        if options.disk:
+            parse_disk(options, writer)
+        elif is_logical_volume(options.source):
+            parse_logical(options, writer, checkpoint=checkpoint)
+        else:
+            parse_file(options, writer, checkpoint=checkpoint)
+    finally:
+        writer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import sys
+sys.path.append("..")
+import logging
+import argparse
+from winobjid.service import ObjectIdServer, ObjectIdService
+
+
+VALID_DEBUG_LEVELS = ["ERROR", "WARN", "INFO", "DEBUG"]
+__VERSION__ = "0.0.1"
+
+
+def set_debug_level(debug_level):
+    if debug_level in VALID_DEBUG_LEVELS:
+        logging.basicConfig(
+            level=getattr(logging, debug_level)
+        )
+    else:
+        raise (Exception("{} is not a valid debug level.".format(debug_level)))
+
+
+def get_arguments():
+    usage = u"""Load one or more $O Indexes once and answer queries over a local HTTP/JSON endpoint.
+    version: {}
+
+    GET /status
+    GET /entries?object_id=&birth_volume=&birth_object=&birth_domain=&mac=
+                &mft_entry=&mft_entry_start=&mft_entry_end=&start=&end=&source=
+                &offset=&limit=
+    """.format(__VERSION__)
+
+    arguments = argparse.ArgumentParser(
+        description=usage,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    arguments.add_argument(
+        "-s", "--source",
+        dest="sources",
+        action="append",
+        required=True,
+        help="The $O Index or a logical volume (logical volume: \\\\.\\C:). "
+             "Can be given more than once."
+    )
+    arguments.add_argument(
+        "--no_recover",
+        dest="no_recover",
+        action="store_true",
+        required=False,
+        default=False,
+        help="Do Not Recover Object Entries."
+    )
+    arguments.add_argument(
+        "--host",
+        dest="host",
+        action="store",
+        required=False,
+        default="127.0.0.1",
+        help="Address to listen on [default=127.0.0.1]"
+    )
+    arguments.add_argument(
+        "--port",
+        dest="port",
+        action="store",
+        type=int,
+        required=False,
+        default=8080,
+        help="Port to listen on [default=8080]"
+    )
+    arguments.add_argument(
+        "--reload_interval",
+        dest="reload_interval",
+        action="store",
+        type=float,
+        required=False,
+        default=5,
+        help="Seconds between checks for changed source files, 0 disables reloading [default=5]"
+    )
+    arguments.add_argument(
+        "--debug",
+        dest="debug",
+        action="store",
+        default="ERROR",
+        choices=VALID_DEBUG_LEVELS,
+        help="Debug level [default=ERROR]"
+    )
+
+    return arguments
+
+
+def main():
+    arguments = get_arguments()
+    options = arguments.parse_args()
+
+    set_debug_level(
+        options.debug
+    )
+
+    service = ObjectIdService(
+        options.sources,
+        recover=not options.no_recover
+    )
+    if options.reload_interval > 0:
+        service.watch(options.reload_interval)
+
+    server = ObjectIdServer(
+        (options.host, options.port), service
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
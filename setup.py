@@ -14,7 +14,12 @@ setup(
     install_requires=[
         'pytsk3'
     ],
+    extras_require={
+        'zstd': ['zstandard']
+    },
     scripts=[
-        'scripts/objid_indx_parser.py'
+        'scripts/objid_indx_parser.py',
+        'scripts/objid_serve.py',
+        'scripts/objid_batch.py'
     ]
 )
@@ -0,0 +1,290 @@
+import os
+import glob
+import json
+import time
+import shutil
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from winobjid.logical import is_logical_volume, iter_source_records
+from winobjid.writer import OutputWriter, compression_from_path
+
+EXTENSIONS = {
+    "none": ".jsonl",
+    "gzip": ".jsonl.gz",
+    "zstd": ".jsonl.zst"
+}
+
+
+def read_manifest(path):
+    """Read a manifest of sources, one per line. Blank lines and lines starting
+    with # are ignored.
+    """
+    sources = []
+    with open(path, "r") as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                sources.append(line)
+    return sources
+
+
+def expand_sources(patterns):
+    """Expand glob patterns into sources, keeping the order and dropping
+    duplicates. Logical volumes and patterns without matches are kept as is.
+    """
+    sources = []
+    for pattern in patterns:
+        matches = []
+        if not is_logical_volume(pattern):
+            matches = sorted(glob.glob(pattern))
+        for source in matches or [pattern]:
+            if source not in sources:
+                sources.append(source)
+    return sources
+
+
+def get_source_size(source):
+    """Size used to schedule the largest sources first. Logical volumes and
+    devices whose size can not be read go first.
+    """
+    try:
+        size = os.path.getsize(source)
+    except OSError:
+        return float("inf")
+    if size == 0 and not os.path.isfile(source):
+        return float("inf")
+    return size
+
+
+def get_source_device(source):
+    """The device a source is read from. Used to cap concurrent I/O per device.
+    """
+    if is_logical_volume(source):
+        return source.upper()
+    try:
+        return os.stat(source).st_dev
+    except OSError:
+        return source
+
+
+def process_source(source, output_path, compression=None, recover=True):
+    """Parse one source into output_path. This is a module level function so
+    that it can be handed to a process pool.
+
+    Returns:
+        dict with the source's entry count, timing and error (if any). The
+        output of a failed source is removed and reported as None.
+    """
+    start = time.time()
+    result = {
+        "source": source,
+        "output": output_path,
+        "entries": 0,
+        "error": None
+    }
+
+    writer = None
+    try:
+        writer = OutputWriter(
+            path=output_path,
+            compression=compression,
+            threads=1
+        )
+        for record in iter_source_records(source, recover=recover):
+            writer.write(json.dumps(record) + "\n")
+            result["entries"] += 1
+    except Exception as error:
+        logging.error("{}: {}".format(source, error))
+        result["error"] = "{}".format(error)
+    finally:
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception as error:
+                logging.error("{}: {}".format(source, error))
+                if result["error"] is None:
+                    result["error"] = "{}".format(error)
+
+    if result["error"] is not None:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        result["output"] = None
+
+    result["seconds"] = time.time() - start
+    return result
+
+
+class BatchJob(object):
+    def __init__(self, number, source):
+        self.number = number
+        self.source = source
+        self.size = get_source_size(source)
+        self.device = get_source_device(source)
+        self.submitted = None
+
+
+class BatchScheduler(object):
+    """Process many sources over a process pool. The largest sources are
+    dispatched first and, when device_workers is set, at most that many sources
+    are read from the same device at once. Each source gets its own output file
+    in output_dir, or all records go to merged_output (every record has a source
+    field).
+    """
+    def __init__(self, sources, output_dir=None, merged_output=None,
+                 compression=None, workers=None, device_workers=None,
+                 recover=True):
+        """Create BatchScheduler
+
+        Params:
+            sources (list): The sources to process.
+            output_dir (unicode): Directory for the per source outputs.
+            merged_output (unicode): A single output file for all sources.
+            compression (unicode): none, gzip or zstd [default=from merged_output
+                                   extension, otherwise none]
+            workers (int): The number of worker processes [default=cpu count]
+            device_workers (int): Max sources read at once from one device
+                                  [default=None, no limit]
+            recover (bool): Also recover unallocated entries.
+        """
+        if (output_dir is None) == (merged_output is None):
+            raise Exception("Either an output directory or a merged output is required.")
+        if workers is not None and workers < 1:
+            raise Exception("workers must be at least 1.")
+        if device_workers is not None and device_workers < 1:
+            raise Exception("device_workers must be at least 1.")
+
+        if compression is None:
+            compression = compression_from_path(merged_output) if merged_output else "none"
+
+        self.jobs = [
+            BatchJob(number, source) for number, source in enumerate(sources)
+        ]
+        self.output_dir = output_dir
+        self.merged_output = merged_output
+        self.compression = compression
+        self.workers = workers or os.cpu_count() or 1
+        self.device_workers = device_workers
+        self.recover = recover
+
+    def _get_output_path(self, job, directory):
+        name = os.path.basename(job.source.rstrip("\\/:")) or "source"
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        return os.path.join(
+            directory, "{:04d}_{}{}".format(job.number, name, EXTENSIONS[self.compression])
+        )
+
+    def _next_job(self, pending, device_counts):
+        for job in pending:
+            if self.device_workers is None or \
+                    device_counts.get(job.device, 0) < self.device_workers:
+                pending.remove(job)
+                return job
+        return None
+
+    def _submit(self, executor, job, directory):
+        return executor.submit(
+            process_source,
+            job.source,
+            self._get_output_path(job, directory),
+            compression=self.compression,
+            recover=self.recover
+        )
+
+    def run(self):
+        """Process every source and return the summary.
+        """
+        start = time.time()
+        pending = sorted(self.jobs, key=lambda job: job.size, reverse=True)
+        device_counts = {}
+        results = []
+        running = {}
+
+        if self.merged_output:
+            directory = tempfile.mkdtemp(
+                dir=os.path.dirname(os.path.abspath(self.merged_output))
+            )
+            merged_fh = open(self.merged_output, "wb")
+        else:
+            directory = self.output_dir
+            os.makedirs(directory, exist_ok=True)
+            merged_fh = None
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while pending or running:
+                while len(running) < self.workers:
+                    job = self._next_job(pending, device_counts)
+                    if job is None:
+                        break
+                    device_counts[job.device] = device_counts.get(job.device, 0) + 1
+                    job.submitted = time.time()
+                    try:
+                        future = self._submit(executor, job, directory)
+                    except BrokenProcessPool:
+                        # a worker died, start a new pool for the remaining sources
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(max_workers=self.workers)
+                        future = self._submit(executor, job, directory)
+                    running[future] = job
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    device_counts[job.device] -= 1
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        # e.g. BrokenProcessPool when a worker dies
+                        error = "{}".format(error) or type(error).__name__
+                        logging.error("{}: {}".format(job.source, error))
+                        result = {
+                            "source": job.source,
+                            "output": None,
+                            "entries": 0,
+                            "error": error,
+                            "seconds": time.time() - job.submitted
+                        }
+                    result["size"] = None if job.size == float("inf") else job.size
+                    results.append(result)
+
+                    if merged_fh is not None and result["output"] is not None:
+                        # gzip members and zstd frames can be concatenated
+                        with open(result["output"], "rb") as fh:
+                            shutil.copyfileobj(fh, merged_fh)
+                        os.remove(result["output"])
+                        result["output"] = self.merged_output
+
+                    logging.info("Finished {} ({} entries, {:.2f}s)".format(
+                        job.source, result["entries"], result["seconds"]
+                    ))
+        finally:
+            executor.shutdown()
+            if merged_fh is not None:
+                merged_fh.close()
+                shutil.rmtree(directory, ignore_errors=True)
+
+        return self._summarize(results, time.time() - start)
+
+    @staticmethod
+    def _throughput(size, seconds):
+        if not size or not seconds:
+            return None
+        return size / seconds / (1024 * 1024)
+
+    def _summarize(self, results, seconds):
+        for result in results:
+            result["throughput_mb_s"] = self._throughput(result["size"], result["seconds"])
+
+        total_size = sum(result["size"] or 0 for result in results)
+        return {
+            "sources": len(results),
+            "succeeded": sum(1 for result in results if result["error"] is None),
+            "failed": sum(1 for result in results if result["error"] is not None),
+            "entries": sum(result["entries"] for result in results),
+            "bytes": total_size,
+            "seconds": seconds,
+            "throughput_mb_s": self._throughput(total_size, seconds),
+            "results": sorted(results, key=lambda result: result["source"])
+        }
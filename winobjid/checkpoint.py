@@ -0,0 +1,71 @@
+import os
+import json
+import time
+import logging
+
+DEFAULT_CHECKPOINT_BUDGET = 0.01
+
+
+class Checkpoint(object):
+    """Periodically saves the state of a job so it can be resumed. A checkpoint
+    is only taken while the time spent checkpointing stays under budget (a
+    fraction of the elapsed time), so syncing the output never dominates a run.
+    """
+    def __init__(self, path, budget=DEFAULT_CHECKPOINT_BUDGET):
+        """Create Checkpoint
+
+        Params:
+            path (unicode): The checkpoint file.
+            budget (float): The fraction of run time that may be spent on checkpoints.
+        """
+        self.path = path
+        self.budget = budget
+        self.saves = 0
+        self.state = None
+        self._start = time.time()
+        self._spent = 0.0
+        self._last_cost = 0.0
+
+    def load(self):
+        """Read the saved state (also kept in self.state). None if there is no
+        checkpoint.
+        """
+        self.state = None
+        if os.path.exists(self.path):
+            with open(self.path, "r") as fh:
+                self.state = json.load(fh)
+        return self.state
+
+    def is_due(self):
+        elapsed = time.time() - self._start
+        return self._spent + self._last_cost <= self.budget * elapsed
+
+    def save(self, state):
+        """Atomically replace the checkpoint file with state.
+        """
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as fh:
+            json.dump(state, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temp_path, self.path)
+        self.saves += 1
+
+    def maybe_save(self, get_state):
+        """Save the state returned by get_state if the budget allows it. The
+        time spent in get_state (e.g. syncing the output) counts against the
+        budget.
+
+        Returns:
+            True if a checkpoint was saved.
+        """
+        if not self.is_due():
+            return False
+
+        start = time.time()
+        self.save(get_state())
+        cost = time.time() - start
+        self._spent += cost
+        self._last_cost = cost
+        logging.debug("Checkpoint saved in {:.4f}s".format(cost))
+        return True
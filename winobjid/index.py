@@ -1,9 +1,13 @@
+import bisect
 import struct
 import logging
 import binascii
+import collections
 from winobjid.objid import ObjectId
 from winobjid.utils import NtfsReference
 
+DEFAULT_PAGE_CACHE_SIZE = 64 * 1024 * 1024
+
 
 class InvalidIndexPageHeader(Exception):
     def __init__(self, message):
@@ -47,6 +51,15 @@ class IndexOEntry(object):
     def get_offset(self):
         return self._offset
 
+    def get_buffer(self):
+        """Return the raw entry bytes. Useful when only a few fields are needed
+        and building the full dict is too costly.
+        """
+        return self._buffer
+
+    def is_recovered(self):
+        return self._recovered
+
     def is_valid(self):
         """Check if valid record. This is useful for unallocated parsing.
         """
@@ -275,6 +288,25 @@ class IndexPage(object):
             self._index_block_buf[(i*512)+510] = v1
             self._index_block_buf[(i*512)+511] = v2
 
+    def get_offset(self):
+        return self._offset
+
+    def get_entry_at(self, offset):
+        """Get the entry at an absolute offset within this page. Entries past the
+        allocated entries are flagged as recovered.
+        """
+        pointer = offset - self._offset
+        if pointer < 0 or pointer >= self.get_page_size():
+            raise Exception("Offset {} is not within the page at offset {}.".format(
+                offset, self._offset
+            ))
+
+        return IndexOEntry(
+            self._index_block_buf[pointer:],
+            offset=offset,
+            recover=pointer >= self.header.index_entry_size
+        )
+
     def iter_entries(self):
         pointer = self.header.index_entry_offset + 24
 
@@ -315,16 +347,199 @@ class IndexPage(object):
                 break
 
 
+class IndexPageInfo(object):
+    """A page table record of an index page."""
+    def __init__(self, offset, header, entry_count=None):
+        self.offset = offset
+        self.vcn = header.vcn
+        self.logfile_sequence_number = header.logfile_sequence_number
+        self.page_size = header.block_size()
+        self.entry_count = entry_count
+
+    def as_dict(self):
+        return {
+            "offset": self.offset,
+            "vcn": self.vcn,
+            "logfile_sequence_number": self.logfile_sequence_number,
+            "page_size": self.page_size,
+            "entry_count": self.entry_count
+        }
+
+
 class ObjectIndexFile(object):
-    def __init__(self, file_handle):
+    def __init__(self, file_handle, cache_size=DEFAULT_PAGE_CACHE_SIZE):
+        """Create ObjectIndexFile
+
+        Params:
+            file_handle (file): A file like object of the $O index.
+            cache_size (int): The memory cap in bytes of the page cache used by
+                              get_page, get_page_at and get_entry.
+        """
         self._file_handle = file_handle
         self._offset = 0
         self._file_handle.seek(0, 2)
         self._file_size = self._file_handle.tell()
         self._file_handle.seek(0, 0)
 
-    def iter_index_pages(self):
-        while True:
+        self._page_table = None
+        self._page_offsets = []
+        self._vcn_map = {}
+
+        self._cache_size = cache_size
+        self._page_cache = collections.OrderedDict()
+        self._cached_bytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+
+    def build_page_table(self, quick=False):
+        """Scan the index once and record the offset, vcn, lsn and entry count
+        of every page.
+
+        Params:
+            quick (bool): Only read the page headers. Entry counts are not
+                          available (None) in a quick scan.
+        Returns:
+            list of IndexPageInfo
+        """
+        page_table = []
+        offset = 0
+        while offset < self._file_size:
+            self._file_handle.seek(offset)
+            try:
+                if quick:
+                    raw_buffer = self._file_handle.read(64)
+                    if not bytes(raw_buffer[0:4]) == b"INDX":
+                        raise(
+                            InvalidIndexPageHeader(
+                                "Invalid Page Header Signature [{}] at offset: {}".format(
+                                    bytes(raw_buffer[0:4]), offset
+                                )
+                            )
+                        )
+                    header = IndexHeader(raw_buffer)
+                    entry_count = None
+                else:
+                    index = IndexPage(
+                        self._file_handle,
+                        offset=offset
+                    )
+                    header = index.header
+                    entry_count = sum(1 for _ in index.iter_entries())
+            except Exception as error:
+                logging.error("{}".format(error))
+                break
+
+            page_info = IndexPageInfo(
+                offset, header, entry_count=entry_count
+            )
+            if page_info.page_size <= 0:
+                logging.error("Invalid page size at offset: {}".format(offset))
+                break
+
+            page_table.append(page_info)
+            offset += page_info.page_size
+
+        self._page_table = page_table
+        self._page_offsets = [page_info.offset for page_info in page_table]
+        self._vcn_map = dict(
+            (page_info.vcn, page_info) for page_info in page_table
+        )
+        return page_table
+
+    def get_page_table(self):
+        """Return the page table, doing a quick scan if it has not been built.
+        """
+        if self._page_table is None:
+            self.build_page_table(quick=True)
+        return self._page_table
+
+    def get_page_at(self, offset):
+        """Get the (fixed up) index page that starts at offset. Pages are kept in
+        an LRU cache.
+        """
+        index = self._page_cache.get(offset)
+        if index is not None:
+            self._cache_hits += 1
+            self._page_cache.move_to_end(offset)
+            return index
+
+        self._cache_misses += 1
+        self._file_handle.seek(offset)
+        index = IndexPage(
+            self._file_handle,
+            offset=offset
+        )
+
+        self._page_cache[offset] = index
+        self._cached_bytes += index.get_page_size()
+        while self._cached_bytes > self._cache_size and len(self._page_cache) > 1:
+            _, evicted = self._page_cache.popitem(last=False)
+            self._cached_bytes -= evicted.get_page_size()
+            self._cache_evictions += 1
+
+        return index
+
+    def get_page(self, vcn):
+        """Get the index page with the given VCN.
+        """
+        self.get_page_table()
+        page_info = self._vcn_map.get(vcn)
+        if page_info is None:
+            raise Exception("No index page with VCN {}.".format(vcn))
+        return self.get_page_at(page_info.offset)
+
+    def get_entry(self, offset):
+        """Get the index entry at an absolute file offset (the offset field of
+        the entry output).
+        """
+        self.get_page_table()
+        position = bisect.bisect_right(self._page_offsets, offset) - 1
+        if position < 0:
+            raise Exception("Offset {} is not within an index page.".format(offset))
+
+        index = self.get_page_at(self._page_offsets[position])
+        return index.get_entry_at(offset)
+
+    def get_cache_stats(self):
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "evictions": self._cache_evictions,
+            "pages": len(self._page_cache),
+            "bytes": self._cached_bytes,
+            "capacity": self._cache_size
+        }
+
+    def iter_entries(self, recover=True, offset=0):
+        """Iterate the allocated entries (and recovered entries) of every page.
+
+        Params:
+            recover (bool): Also recover unallocated entries.
+            offset (int): The page offset to start at [default=0, the first page]
+        """
+        for index_page in self.iter_index_pages(offset=offset):
+            for entry in index_page.iter_entries():
+                yield entry
+
+            if recover:
+                for unalloc_entry in index_page.iter_unalloc_entries():
+                    yield unalloc_entry
+
+    def iter_index_pages(self, offset=None):
+        """Iterate the index pages.
+
+        Params:
+            offset (int): Start at the page at this offset instead of where the
+                          previous iteration stopped (e.g. to resume a job).
+        """
+        if offset is not None:
+            self._offset = offset
+
+        while self._offset < self._file_size:
+            self._file_handle.seek(
+                self._offset
+            )
             try:
                 index = IndexPage(
                     self._file_handle,
@@ -344,7 +559,3 @@ class ObjectIndexFile(object):
 
             if self._offset >= self._file_size:
                 break
-
-            self._file_handle.seek(
-                self._offset
-            )
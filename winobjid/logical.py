@@ -1,14 +1,29 @@
+import os
+import re
+import json
+import shutil
+import logging
+import tempfile
 import pytsk3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from winobjid.index import ObjectIndexFile
 from winobjid.tskio import FileInfo, TskFileIo
 
 
+def is_logical_volume(source):
+    """Check if the source is a logical volume (\\\\.\\C:).
+    """
+    return re.match(r'\\\\.\\[a-zA-Z]:', source) is not None
+
+
 class Volume(object):
     """A class to process the logical volume."""
-    def __init__(self, file_io):
+    def __init__(self, file_io, offset=0):
         """Create LogicalEnumerator
 
         Params:
             file_io (FileIO): I file like object representing a volume.
+            offset (int): The byte offset of the file system within file_io.
             description (unicode): description of the volume
             temp_location (unicode): The location to extract files to
             cleanup (bool): Remove the temp folder after processesing
@@ -16,10 +31,14 @@ class Volume(object):
             dump_db (bool): True = Dump all database tables.
         """
         self.file_io = file_io
+        self.offset = offset
         self.tsk_fs = pytsk3.FS_Info(
-            self.file_io
+            self.file_io, offset=self.offset
         )
 
+    def is_ntfs(self):
+        return self.tsk_fs.info.ftype == pytsk3.TSK_FS_TYPE_NTFS
+
     def get_obj_file(self):
         tsk_file = self.tsk_fs.open(
             "/$Extend/$ObjId"
@@ -34,3 +53,195 @@ class Volume(object):
                         return TskFileIo(
                             tsk_file, file_info
                         )
+
+
+def iter_partition_records(source, partition_index, offset, recover=True):
+    """Iterate the entry dicts of the $O index of the NTFS partition at offset,
+    tagged with the partition.
+
+    Params:
+        source (unicode): The disk image (or device) to open.
+        partition_index (int): The partition's slot in the partition table.
+        offset (int): The byte offset of the partition.
+        recover (bool): Also recover unallocated entries.
+    """
+    partition = {
+        "index": partition_index,
+        "offset": offset
+    }
+
+    tsk_img = pytsk3.Img_Info(
+        source
+    )
+    volume = Volume(
+        tsk_img, offset=offset
+    )
+    try:
+        file_io = volume.get_obj_file()
+    except IOError as error:
+        logging.error("Partition {} at offset {}: {}".format(
+            partition_index, offset, error
+        ))
+        return
+
+    if not file_io:
+        return
+
+    obj_id_file = ObjectIndexFile(
+        file_io
+    )
+    for entry in obj_id_file.iter_entries(recover=recover):
+        record = entry.as_dict()
+        record["partition"] = partition
+        yield record
+
+
+def parse_partition(source, partition_index, offset, output_path, recover=True):
+    """Write the records of a partition to output_path as JSON lines. This is a
+    module level function so that it can be handed to a process pool.
+
+    Returns:
+        the number of records written.
+    """
+    count = 0
+    with open(output_path, "w") as fh:
+        for record in iter_partition_records(
+                source, partition_index, offset, recover=recover):
+            fh.write(json.dumps(record) + "\n")
+            count += 1
+    return count
+
+
+class Disk(object):
+    """A class to process a disk image that contains a partition table."""
+    def __init__(self, source):
+        """Create Disk
+
+        Params:
+            source (unicode): The disk image (or device) to open.
+        """
+        self.source = source
+        self.tsk_img = pytsk3.Img_Info(
+            self.source
+        )
+        self.tsk_vs = pytsk3.Volume_Info(
+            self.tsk_img
+        )
+        self.block_size = self.tsk_vs.info.block_size
+
+    def iter_ntfs_partitions(self):
+        """Yield (partition index, byte offset) for each NTFS partition.
+        """
+        for partition in self.tsk_vs:
+            if partition.flags != pytsk3.TSK_VS_PART_FLAG_ALLOC:
+                continue
+
+            offset = partition.start * self.block_size
+            try:
+                volume = Volume(
+                    self.tsk_img, offset=offset
+                )
+            except IOError:
+                logging.debug("No file system in partition {} at offset {}".format(
+                    partition.addr, offset
+                ))
+                continue
+
+            if volume.is_ntfs():
+                yield partition.addr, offset
+
+    def iter_entries(self, recover=True, workers=None, temp_dir=None):
+        """Parse each NTFS partition in its own worker process and yield the
+        entry dicts as each partition finishes. Workers write their records to
+        a temporary file that is streamed back, so memory does not grow with
+        the size of the $O index.
+
+        Params:
+            recover (bool): Also recover unallocated entries.
+            workers (int): The number of worker processes [default=cpu count]
+            temp_dir (unicode): Where the temporary files go [default=system temp]
+        """
+        partitions = list(self.iter_ntfs_partitions())
+        if not partitions:
+            return
+
+        directory = tempfile.mkdtemp(dir=temp_dir)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {}
+                for index, offset in partitions:
+                    output_path = os.path.join(
+                        directory, "partition_{}.jsonl".format(index)
+                    )
+                    future = executor.submit(
+                        parse_partition, self.source, index, offset, output_path, recover
+                    )
+                    futures[future] = output_path
+
+                for future in as_completed(futures):
+                    future.result()
+                    output_path = futures[future]
+                    with open(output_path, "r") as fh:
+                        for line in fh:
+                            yield json.loads(line)
+                    os.remove(output_path)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def is_index_file(source):
+    """Check if the source starts with an INDX page (an extracted $O index).
+    """
+    with open(source, 'rb') as fh:
+        return fh.read(4) == b"INDX"
+
+
+def iter_source_records(source, recover=True):
+    """Iterate the entry dicts of a source tagged with the source. The source
+    can be a logical volume, an extracted $O index, a disk image with a
+    partition table (records are also tagged with the partition) or a volume
+    image.
+    """
+    if is_logical_volume(source):
+        records = _iter_volume_records(
+            pytsk3.Img_Info(source), recover
+        )
+    elif is_index_file(source):
+        records = _iter_file_records(source, recover)
+    else:
+        try:
+            disk = Disk(source)
+        except IOError:
+            disk = None
+
+        if disk is None:
+            records = _iter_volume_records(
+                pytsk3.Img_Info(source), recover
+            )
+        else:
+            records = (
+                record
+                for index, offset in disk.iter_ntfs_partitions()
+                for record in iter_partition_records(source, index, offset, recover=recover)
+            )
+
+    for record in records:
+        record["source"] = source
+        yield record
+
+
+def _iter_volume_records(tsk_img, recover):
+    volume = Volume(
+        tsk_img
+    )
+    file_io = volume.get_obj_file()
+    if not file_io:
+        return
+    for entry in ObjectIndexFile(file_io).iter_entries(recover=recover):
+        yield entry.as_dict()
+
+
+def _iter_file_records(source, recover):
+    with open(source, 'rb') as fh:
+        for entry in ObjectIndexFile(fh).iter_entries(recover=recover):
+            yield entry.as_dict()
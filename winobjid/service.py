@@ -0,0 +1,343 @@
+import os
+import json
+import uuid
+import bisect
+import logging
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from winobjid.logical import is_logical_volume, iter_source_records
+
+GUID_FIELDS = ["object_id", "birth_volume", "birth_object", "birth_domain"]
+UUID_EPOCH = datetime.datetime(1582, 10, 15)
+DEFAULT_PAGE_LIMIT = 1000
+MAX_PAGE_LIMIT = 100000
+
+
+class InvalidQuery(Exception):
+    def __init__(self, message):
+        super(InvalidQuery, self).__init__(message)
+
+
+def normalize_guid(value):
+    """Return the raw hex of a GUID given either as the uuid string or the raw hex.
+    """
+    value = value.strip().lower()
+    if "-" in value:
+        try:
+            return uuid.UUID(value).bytes_le.hex()
+        except ValueError:
+            raise InvalidQuery("Invalid GUID: {}".format(value))
+    return value
+
+
+def parse_timestamp(value):
+    """Convert a timestamp_uint64 or a "YYYY-MM-DD[ HH:MM:SS[.ffffff]]" string to
+    the object id timestamp (100 nanosecond intervals since 1582-10-15).
+    """
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+
+    for fmt in ["%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"]:
+        try:
+            dt_object = datetime.datetime.strptime(value, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        raise InvalidQuery("Invalid timestamp: {}".format(value))
+
+    delta = dt_object - UUID_EPOCH
+    return ((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds) * 10
+
+
+class ObjectIdStore(object):
+    """Immutable in memory indexes over the entries of one or more sources.
+    Records are kept as serialized JSON lines. GUID fields and MAC addresses are
+    hash indexed, timestamps and MFT entries are kept in sorted arrays. Only
+    time based (version 1) object ids are in the timestamp index.
+    """
+    def __init__(self, records):
+        self._lines = []
+        self._sources = []
+        self._guid_index = dict((field, {}) for field in GUID_FIELDS)
+        self._mac_index = {}
+        timestamps = []
+        mft_entries = []
+
+        for position, record in enumerate(records):
+            self._lines.append(
+                (json.dumps(record) + "\n").encode("utf-8")
+            )
+            self._sources.append(record.get("source"))
+
+            for field in GUID_FIELDS:
+                self._guid_index[field].setdefault(
+                    record[field]["hex"], []
+                ).append(position)
+
+            self._mac_index.setdefault(
+                record["object_id"]["mac"], []
+            ).append(position)
+            # only time based (version 1) object ids have a meaningful timestamp
+            if record["object_id"]["version"] == 1:
+                timestamps.append(
+                    (record["object_id"]["timestamp_uint64"], position)
+                )
+            mft_entries.append(
+                (record["mft_reference"]["entry"], position)
+            )
+
+        timestamps.sort()
+        mft_entries.sort()
+        self._timestamp_keys = [key for key, _ in timestamps]
+        self._timestamp_positions = [position for _, position in timestamps]
+        self._mft_keys = [key for key, _ in mft_entries]
+        self._mft_positions = [position for _, position in mft_entries]
+
+    def __len__(self):
+        return len(self._lines)
+
+    @staticmethod
+    def _range(keys, positions, start, end):
+        lower = 0 if start is None else bisect.bisect_left(keys, start)
+        upper = len(keys) if end is None else bisect.bisect_right(keys, end)
+        return positions[lower:upper]
+
+    def query(self, object_id=None, birth_volume=None, birth_object=None,
+              birth_domain=None, mac=None, mft_entry=None, mft_entry_start=None,
+              mft_entry_end=None, start=None, end=None, source=None):
+        """Return the sorted positions (a list or range) of the records matching
+        every given filter.
+        """
+        candidates = []
+        guids = {
+            "object_id": object_id,
+            "birth_volume": birth_volume,
+            "birth_object": birth_object,
+            "birth_domain": birth_domain
+        }
+        for field, value in guids.items():
+            if value is not None:
+                candidates.append(
+                    self._guid_index[field].get(normalize_guid(value), [])
+                )
+
+        if mac is not None:
+            candidates.append(
+                self._mac_index.get(mac.replace(":", "").replace("-", "").lower(), [])
+            )
+
+        if mft_entry is not None:
+            mft_entry_start = mft_entry_end = mft_entry
+        if mft_entry_start is not None or mft_entry_end is not None:
+            candidates.append(self._range(
+                self._mft_keys, self._mft_positions, mft_entry_start, mft_entry_end
+            ))
+
+        if start is not None or end is not None:
+            candidates.append(self._range(
+                self._timestamp_keys, self._timestamp_positions, start, end
+            ))
+
+        if not candidates:
+            # no index filter, positions are already in order
+            if source is None:
+                return range(len(self._lines))
+            return [
+                position for position, value in enumerate(self._sources) if value == source
+            ]
+
+        candidates.sort(key=len)
+        matches = set(candidates[0])
+        for other in candidates[1:]:
+            matches.intersection_update(other)
+            if not matches:
+                break
+
+        if source is not None:
+            matches = [
+                position for position in matches if self._sources[position] == source
+            ]
+
+        return sorted(matches)
+
+    def get_line(self, position):
+        return self._lines[position]
+
+
+class ObjectIdService(object):
+    """Loads the sources into an ObjectIdStore and rebuilds it when a source file
+    changes. Readers grab the current store once per request, so a reload never
+    blocks or mixes results.
+    """
+    def __init__(self, sources, recover=True):
+        self.sources = sources
+        self.recover = recover
+        self.store = None
+        self.loaded = None
+        self.reload_count = 0
+        self.errors = {}
+        self._signatures = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _get_signatures(self):
+        signatures = {}
+        for source in self.sources:
+            if is_logical_volume(source):
+                continue
+            try:
+                stat = os.stat(source)
+                signatures[source] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signatures[source] = None
+        return signatures
+
+    def reload(self):
+        """Load every source into a new store. If a source fails to load and
+        there is a previous store, the previous store is kept (and the next
+        check retries) so a source caught mid-copy never replaces a complete
+        index with a partial one.
+        """
+        with self._lock:
+            signatures = self._get_signatures()
+            records = []
+            errors = {}
+            for source in self.sources:
+                try:
+                    records.extend(
+                        list(iter_source_records(source, recover=self.recover))
+                    )
+                except Exception as error:
+                    logging.error("Unable to load {}: {}".format(source, error))
+                    errors[source] = "{}".format(error)
+
+            self.errors = errors
+            if errors and self.store is not None:
+                logging.error("Keeping the previously loaded entries.")
+                return False
+
+            self.store = ObjectIdStore(records)
+            if not errors:
+                self._signatures = signatures
+            self.loaded = datetime.datetime.utcnow()
+            self.reload_count += 1
+            logging.info("Loaded {} entries from {} sources.".format(
+                len(self.store), len(self.sources)
+            ))
+            return True
+
+    def reload_if_changed(self):
+        if self._get_signatures() != self._signatures:
+            logging.info("Source changed, reloading.")
+            return self.reload()
+        return False
+
+    def watch(self, interval):
+        """Start a daemon thread that checks the sources every interval seconds.
+        """
+        def run():
+            event = threading.Event()
+            while not event.wait(interval):
+                try:
+                    self.reload_if_changed()
+                except Exception as error:
+                    logging.error("Reload failed: {}".format(error))
+
+        thread = threading.Thread(target=run, name="objid-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            "sources": self.sources,
+            "entries": len(self.store),
+            "loaded": str(self.loaded),
+            "reload_count": self.reload_count,
+            "errors": self.errors
+        }
+
+
+class ObjectIdRequestHandler(BaseHTTPRequestHandler):
+    """GET /status and GET /entries?<filters>&offset=N&limit=N
+
+    /entries streams matching records as JSON lines. X-Total-Count holds the
+    number of matches and X-Next-Offset the offset of the next page (if any).
+    """
+    INT_PARAMS = ["mft_entry", "mft_entry_start", "mft_entry_end", "offset", "limit"]
+    STR_PARAMS = GUID_FIELDS + ["mac", "source"]
+    TIME_PARAMS = ["start", "end"]
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _send_json(self, code, value):
+        body = (json.dumps(value) + "\n").encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_params(self, query):
+        params = {}
+        for name, values in parse_qs(query).items():
+            value = values[-1]
+            if name in self.INT_PARAMS:
+                try:
+                    params[name] = int(value)
+                except ValueError:
+                    raise InvalidQuery("{} must be an integer.".format(name))
+            elif name in self.TIME_PARAMS:
+                params[name] = parse_timestamp(value)
+            elif name in self.STR_PARAMS:
+                params[name] = value
+            else:
+                raise InvalidQuery("Unknown parameter: {}".format(name))
+        return params
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = self.server.service
+
+        if url.path == "/status":
+            self._send_json(200, service.status())
+            return
+        elif url.path != "/entries":
+            self._send_json(404, {"error": "Unknown path: {}".format(url.path)})
+            return
+
+        try:
+            params = self._get_params(url.query)
+            offset = params.pop("offset", 0)
+            limit = min(params.pop("limit", DEFAULT_PAGE_LIMIT), MAX_PAGE_LIMIT)
+            if offset < 0 or limit < 0:
+                raise InvalidQuery("offset and limit must be positive.")
+
+            store = service.store
+            matches = store.query(**params)
+        except InvalidQuery as error:
+            self._send_json(400, {"error": str(error)})
+            return
+
+        page = matches[offset:offset + limit]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("X-Total-Count", str(len(matches)))
+        if offset + limit < len(matches):
+            self.send_header("X-Next-Offset", str(offset + limit))
+        self.end_headers()
+
+        for position in page:
+            self.wfile.write(store.get_line(position))
+
+
+class ObjectIdServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        self.service = service
+        ThreadingHTTPServer.__init__(self, address, ObjectIdRequestHandler)
@@ -0,0 +1,205 @@
+import math
+import struct
+import hashlib
+import datetime
+from winobjid.objid import ObjectId
+
+# 100 nanosecond intervals between 1582-10-15 and 1601-01-01
+UUID_EPOCH_DELTA = 5748192000000000
+# 100 nanosecond intervals in a day
+DAY_INTERVALS = 864000000000
+
+
+class HyperLogLog(object):
+    """Approximate distinct counter with a fixed memory footprint of
+    2^precision registers.
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.register_count = 1 << precision
+        self.registers = bytearray(self.register_count)
+
+    def add(self, value):
+        if not isinstance(value, bytes):
+            value = repr(value).encode()
+        hashed = int.from_bytes(
+            hashlib.blake2b(value, digest_size=8).digest(), "little"
+        )
+        index = hashed & (self.register_count - 1)
+        remaining = hashed >> self.precision
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.register_count
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+
+class BoundedCounter(object):
+    """Counts keys exactly until capacity distinct keys have been seen. After
+    that the counts become Misra-Gries heavy hitter estimates (lower bounds that
+    are off by at most the reported error) and the distinct count comes from a
+    HyperLogLog sketch.
+    """
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+        self.error = 0
+        self._sketch = None
+
+    def is_exact(self):
+        return self._sketch is None
+
+    def add(self, key):
+        self.total += 1
+        if self._sketch is not None:
+            self._sketch.add(key)
+
+        if key in self.counts:
+            self.counts[key] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = 1
+        else:
+            if self._sketch is None:
+                self._sketch = HyperLogLog()
+                for seen_key in self.counts:
+                    self._sketch.add(seen_key)
+                self._sketch.add(key)
+
+            # Misra-Gries decrement step. Every pass removes capacity + 1
+            # counts so the amortized cost per key stays constant.
+            self.error += 1
+            for seen_key in list(self.counts):
+                if self.counts[seen_key] == 1:
+                    del self.counts[seen_key]
+                else:
+                    self.counts[seen_key] -= 1
+
+    def distinct(self):
+        if self._sketch is None:
+            return len(self.counts)
+        return self._sketch.count()
+
+    def most_common(self, limit=None):
+        items = sorted(
+            self.counts.items(), key=lambda item: (-item[1], item[0])
+        )
+        if limit is not None:
+            items = items[:limit]
+        return items
+
+    def as_dict(self, key_format=str, limit=None):
+        return {
+            "total": self.total,
+            "distinct": self.distinct(),
+            "exact": self.is_exact(),
+            "max_error": self.error,
+            "counts": [
+                {"key": key_format(key), "count": count}
+                for key, count in self.most_common(limit)
+            ]
+        }
+
+
+class ObjectIdStats(object):
+    """Aggregate $O entries in a single pass over the raw entry bytes.
+    Timestamps (min/max and per day) only come from time based (version 1)
+    object ids.
+    """
+    def __init__(self, capacity=10000, top=None):
+        """Create ObjectIdStats
+
+        Params:
+            capacity (int): Distinct keys counted exactly per counter.
+            top (int): Limit the counts listed in the report.
+        """
+        self.top = top
+        self.allocated = 0
+        self.recovered = 0
+        self.time_based = 0
+        self.mac = BoundedCounter(capacity)
+        self.birth_volume = BoundedCounter(capacity)
+        self.day = BoundedCounter(capacity)
+        self._min_timestamp = None
+        self._max_timestamp = None
+        self._min_object_id = None
+        self._max_object_id = None
+
+    def add_entry(self, entry):
+        self.add_buffer(
+            entry.get_buffer(), recovered=entry.is_recovered()
+        )
+
+    def add_buffer(self, buf, recovered=False):
+        if recovered:
+            self.recovered += 1
+        else:
+            self.allocated += 1
+
+        self.mac.add(bytes(buf[26:32]))
+        self.birth_volume.add(bytes(buf[40:56]))
+
+        # same as ObjectId.version
+        if buf[23] & 0x0f != 1:
+            return
+
+        self.time_based += 1
+        timestamp = struct.unpack_from("<Q", buf, 16)[0] & 0x0fffffffffffffff
+        self.day.add(
+            (timestamp - UUID_EPOCH_DELTA) // DAY_INTERVALS
+        )
+
+        if self._min_timestamp is None or timestamp < self._min_timestamp:
+            self._min_timestamp = timestamp
+            self._min_object_id = bytes(buf[16:32])
+        if self._max_timestamp is None or timestamp > self._max_timestamp:
+            self._max_timestamp = timestamp
+            self._max_object_id = bytes(buf[16:32])
+
+    @staticmethod
+    def _format_day(day):
+        return (datetime.date(1601, 1, 1) + datetime.timedelta(days=day)).isoformat()
+
+    @staticmethod
+    def _format_guid(raw):
+        return str(ObjectId(raw))
+
+    @staticmethod
+    def _timestamp_dict(raw):
+        if raw is None:
+            return None
+        object_id = ObjectId(raw)
+        return {
+            "timestamp": str(object_id.timestamp),
+            "timestamp_uint64": object_id.timestamp_uint64,
+            "object_id": str(object_id)
+        }
+
+    def as_dict(self):
+        day = self.day.as_dict(key_format=self._format_day, limit=self.top)
+        if self.top is None:
+            day["counts"].sort(key=lambda item: item["key"])
+
+        return {
+            "entries": self.allocated + self.recovered,
+            "allocated": self.allocated,
+            "recovered": self.recovered,
+            "time_based": self.time_based,
+            "min_timestamp": self._timestamp_dict(self._min_object_id),
+            "max_timestamp": self._timestamp_dict(self._max_object_id),
+            "mac": self.mac.as_dict(key_format=bytes.hex, limit=self.top),
+            "birth_volume": self.birth_volume.as_dict(
+                key_format=self._format_guid, limit=self.top
+            ),
+            "day": day
+        }
@@ -0,0 +1,266 @@
+import os
+import sys
+import gzip
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+VALID_COMPRESSIONS = ["none", "gzip", "zstd"]
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+def compression_from_path(path):
+    """Guess the compression from the file extension.
+    """
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def is_compression_available(compression):
+    """zstd is only available when the zstandard package is installed.
+    """
+    if compression == "zstd":
+        return zstandard is not None
+    return True
+
+
+def get_compressor(compression, level=None):
+    """Return a function that compresses one block into a standalone gzip member
+    or zstd frame. Members and frames can be concatenated and still decompress
+    as a single stream.
+    """
+    if compression in [None, "none"]:
+        return None
+    elif compression == "gzip":
+        if level is None:
+            level = 6
+
+        def compress(block):
+            return gzip.compress(block, compresslevel=level, mtime=0)
+        return compress
+    elif compression == "zstd":
+        if zstandard is None:
+            raise Exception("zstd compression requires the zstandard package.")
+        if level is None:
+            level = 3
+
+        def compress(block):
+            # compressor objects are not thread safe
+            return zstandard.ZstdCompressor(level=level).compress(block)
+        return compress
+    else:
+        raise Exception("{} is not a valid compression.".format(compression))
+
+
+class BlockWriter(object):
+    """Buffers writes into blocks. When a compressor is given, blocks are
+    compressed independently in the executor (pigz style) and written in order.
+    At most max_pending blocks are in flight, the writer waits on the oldest one
+    before submitting more so memory stays flat.
+    """
+    def __init__(self, file_handle, compressor=None, executor=None,
+                 block_size=DEFAULT_BLOCK_SIZE, max_pending=2):
+        self._file_handle = file_handle
+        self._compressor = compressor
+        self._executor = executor
+        self._block_size = block_size
+        self._max_pending = max_pending
+        self._buffer = bytearray()
+        self._pending = collections.deque()
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._block_size:
+            self._submit_block()
+
+    def _submit_block(self):
+        if not self._buffer:
+            return
+
+        block = bytes(self._buffer)
+        self._buffer = bytearray()
+
+        if self._compressor is None:
+            self._file_handle.write(block)
+            return
+
+        while len(self._pending) >= self._max_pending:
+            self._file_handle.write(self._pending.popleft().result())
+
+        self._pending.append(
+            self._executor.submit(self._compressor, block)
+        )
+
+        while self._pending and self._pending[0].done():
+            self._file_handle.write(self._pending.popleft().result())
+
+    def flush(self):
+        """Write out the partial block and every pending block.
+        """
+        self._submit_block()
+        while self._pending:
+            self._file_handle.write(self._pending.popleft().result())
+        self._file_handle.flush()
+
+
+class OutputWriter(object):
+    """Writes the tool's text output to stdout or a file, optionally compressed
+    and split into shards. Shards roll over on index page boundaries after
+    shard_pages pages or shard_size (uncompressed) bytes.
+    """
+    def __init__(self, path=None, compression=None, level=None, threads=None,
+                 shard_pages=None, shard_size=None, block_size=DEFAULT_BLOCK_SIZE,
+                 resume=None):
+        """Create OutputWriter
+
+        Params:
+            path (unicode): The output file. None writes to stdout.
+            compression (unicode): none, gzip or zstd [default=from path extension]
+            level (int): The compression level.
+            threads (int): Compression threads [default=cpu count]
+            shard_pages (int): Start a new shard every N index pages.
+            shard_size (int): Start a new shard after N uncompressed bytes.
+            block_size (int): The size of the independently compressed blocks.
+            resume (dict): A state returned by sync(). Output written after that
+                           state is truncated and writing continues from there.
+        """
+        if path is None and (shard_pages or shard_size):
+            raise Exception("Sharding requires an output path.")
+        if path is None and resume:
+            raise Exception("Resuming requires an output path.")
+
+        if compression is None:
+            compression = compression_from_path(path) if path else "none"
+
+        self.path = path
+        self.compression = compression
+        self.shard_pages = shard_pages
+        self.shard_size = shard_size
+        self.shard = 0
+
+        self._compressor = get_compressor(compression, level)
+        self._executor = None
+        self._max_pending = 2
+        if self._compressor is not None:
+            threads = threads or os.cpu_count() or 1
+            self._executor = ThreadPoolExecutor(max_workers=threads)
+            self._max_pending = threads * 2
+
+        self._block_size = block_size
+        self._file_handle = None
+        self._writer = None
+        self._page_count = 0
+        self._byte_count = 0
+        self._roll_over = False
+        if resume:
+            self._resume(resume)
+        else:
+            self._open_shard()
+
+    def get_shard_path(self, shard):
+        """Insert the shard number before the extensions (out.jsonl.gz ->
+        out.0001.jsonl.gz).
+        """
+        if not (self.shard_pages or self.shard_size):
+            return self.path
+
+        directory, name = os.path.split(self.path)
+        stem, dot, extensions = name.partition(".")
+        return os.path.join(
+            directory, "{}.{:04d}{}{}".format(stem, shard, dot, extensions)
+        )
+
+    def _open_shard(self):
+        if self.path is None:
+            self._file_handle = sys.stdout.buffer
+        else:
+            self._file_handle = open(self.get_shard_path(self.shard), "wb")
+
+        self._writer = BlockWriter(
+            self._file_handle,
+            compressor=self._compressor,
+            executor=self._executor,
+            block_size=self._block_size,
+            max_pending=self._max_pending
+        )
+        self._page_count = 0
+        self._byte_count = 0
+
+    def _resume(self, state):
+        self.shard = state["shard"]
+        self._file_handle = open(self.get_shard_path(self.shard), "r+b")
+        self._file_handle.truncate(state["position"])
+        self._file_handle.seek(state["position"])
+        self._writer = BlockWriter(
+            self._file_handle,
+            compressor=self._compressor,
+            executor=self._executor,
+            block_size=self._block_size,
+            max_pending=self._max_pending
+        )
+        self._page_count = state["page_count"]
+        self._byte_count = state["byte_count"]
+        self._roll_over = state["roll_over"]
+
+        # shards started after the state are partial output
+        if self.shard_pages or self.shard_size:
+            shard = self.shard + 1
+            while os.path.exists(self.get_shard_path(shard)):
+                os.remove(self.get_shard_path(shard))
+                shard += 1
+
+    def _close_shard(self):
+        self._writer.flush()
+        if self.path is not None:
+            self._file_handle.close()
+
+    def write(self, text):
+        if self._roll_over:
+            self._close_shard()
+            self.shard += 1
+            self._open_shard()
+            self._roll_over = False
+
+        data = text.encode("utf-8")
+        self._byte_count += len(data)
+        self._writer.write(data)
+
+    def end_page(self):
+        """Mark the end of an index page. Shards only roll over here so an
+        index page is never split across two shards.
+        """
+        self._page_count += 1
+        if self.shard_pages and self._page_count >= self.shard_pages:
+            self._roll_over = True
+        if self.shard_size and self._byte_count >= self.shard_size:
+            self._roll_over = True
+
+    def flush(self):
+        self._writer.flush()
+
+    def sync(self):
+        """Flush everything to disk and return the state needed to resume
+        writing at this point.
+        """
+        self._writer.flush()
+        if self.path is not None:
+            os.fsync(self._file_handle.fileno())
+        return {
+            "shard": self.shard,
+            "position": self._file_handle.tell(),
+            "page_count": self._page_count,
+            "byte_count": self._byte_count,
+            "roll_over": self._roll_over
+        }
+
+    def close(self):
+        self._close_shard()
+        if self._executor is not None:
+            self._executor.shutdown()